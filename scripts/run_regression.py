@@ -49,13 +49,22 @@
 # script to perform more advanced operations, particularly for interacting
 # with the operating system and other programs.
 
+# The `argparse` library parses the script's command-line options (for
+# example, `--make`).
+import argparse
+
+
+# The `sys` library gives access to the console output stream
+# (`sys.stdout`), used to write the summary report in one go.
+import sys
+
+
 # The `os` library provides a portable way of using operating system dependent
-# functionality. While not heavily used in this specific version of the script,
-# it is almost always imported in utility scripts like this for tasks such as
-# checking if files exist (`os.path.exists`), creating directories (`os.makedirs`),
-# or constructing file paths in an OS-agnostic way (`os.path.join`). Its
-# presence here indicates good practice and foresight for future script
-# enhancements.
+# functionality. It is almost always imported in utility scripts like this for
+# tasks such as checking if files exist (`os.path.exists`), creating
+# directories (`os.makedirs`), or constructing file paths in an OS-agnostic way
+# (`os.path.join`). Here it is also used to query the number of CPU cores
+# (`os.cpu_count`) when sizing the pool of parallel simulations.
 import os
 
 
@@ -67,13 +76,53 @@ import os
 # Why is this essential? This library is the bridge between our Python
 # automation script and the command-line EDA tools (`iverilog` and `vvp`).
 # We will use functions from this library, specifically `subprocess.run()` and
-# `subprocess.check_output()`, to execute the compilation and simulation
+# `subprocess.Popen()`, to execute the compilation and simulation
 # commands as if we were typing them directly into a terminal. This allows our
 # script to control the entire VLSI toolchain, capture the results, and make
 # decisions based on the outcome.
 import subprocess
 
 
+# The `hashlib`, `json` and `shutil` libraries support the compilation cache.
+# `hashlib` computes a fingerprint (BLAKE2b hash) of the source files, `json`
+# reads and writes the cache's manifest file, and `shutil` copies the cached
+# simulation image back into place. `shutil` also locates the EDA tools on the
+# `PATH`, and `functools` remembers those lookups so each is done only once.
+import functools
+import hashlib
+import json
+import shutil
+
+
+# The `pathlib` library understands file paths, and is used to bring the
+# source file paths into the native form of the operating system.
+import pathlib
+
+
+# The `re` library provides regular expressions, which are used to search the
+# simulation output for the pass/fail keywords.
+import re
+
+
+# `ThreadPoolExecutor` from the `concurrent.futures` library manages a pool of
+# worker threads. It is used to launch several independent simulations at the
+# same time, so that a multi-core machine finishes the regression in a
+# fraction of the time it would take to run every test back-to-back. `wait`
+# with `FIRST_COMPLETED` lets the script react to each test as it finishes.
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+# The `threading` library provides the lock and event used to stop running
+# simulations early (see `--exit-on-first-fail`).
+import threading
+
+
+# The `signal` library names the signal (`SIGTERM`) sent to a whole group of
+# simulator processes when the regression stops early, and installs the
+# handlers that stop them when the script itself is terminated.
+import signal
+
+
 
 # --- Test Case and Compilation Configuration ---
 # This section defines the core configuration of the regression script. By
@@ -83,8 +132,8 @@ import subprocess
 # search for and modify the core execution logic. This is a fundamental
 # principle of good software design.
 
-# `TEST_CASES`: This is a Python list of strings that defines the complete
-# suite of tests to be run.
+# `UNIT_TESTS`: This is a Python list of strings that defines the individual
+# tests of the suite.
 #
 # What it represents: Each string in this list must correspond exactly to a
 # `TESTNAME` that the SystemVerilog testbench (`tb_risc_soc.sv`) can understand
@@ -99,21 +148,64 @@ import subprocess
 # "I2C_TEST", I would first implement the `run_i2c_test` task in the testbench,
 # add the logic to the test sequencer, and then simply add the string
 # "I2C_TEST" to this list. No other changes to this script would be needed.
-TEST_CASES = [
+UNIT_TESTS = [
     "DMA_TEST",
     "CRC_TEST",
     "TIMER_TEST",
     "UART_LOOPBACK_TEST",
     "CORNER_CASE_TEST",
-    "FULL_REGRESSION" # This is a special case that runs all other tests.
 ]
 
+# `FULL_REGRESSION`: A special testbench mode that runs all of the other tests
+# back-to-back in a single simulation. Running it as well as every unit test
+# would execute each test twice, so by default it is not simulated at all:
+# its result is worked out from the unit test results instead (it passes only
+# if every unit test passed). The `--force-full` option really simulates it,
+# which also covers any interaction between tests that share one simulation.
+# The unit tests are then not simulated on their own; instead, the result of
+# each one is read from the markers that `FULL_REGRESSION` prints around it
+# (see `track_components`). `--shards N` splits it into N simulations that
+# run in parallel; that is faster, but only the tests that share a shard are
+# checked for interactions.
+FULL_REGRESSION = "FULL_REGRESSION"
+
+# `TEST_CASES`: Every entry of the summary report, in the order it is printed.
+TEST_CASES = UNIT_TESTS + [FULL_REGRESSION]
+
+# `REGRESSION_REPORT`: A JSON file, written at the end of every run, holding
+# the same test-name-to-result mapping as the summary report. If the design
+# fails to compile, it holds `{"COMPILE": "FAIL"}` instead. The report of the
+# previous run is deleted as soon as a run starts, so that a run that stops
+# early can never leave an out-of-date report behind.
+REGRESSION_REPORT = "regression.json"
+
+
+# `write_report`: Saves `results` as the `REGRESSION_REPORT`.
+def write_report(results):
+    with open(REGRESSION_REPORT, "w") as f:
+        json.dump(results, f, indent=2)
+
+
+# --- Console Banners ---
+# The fixed text of the console report, built once when the script starts.
+RULE = "=" * 39
+THIN_RULE = "-" * 39
+START_BANNER = f"{RULE}\n=== Starting RISC-V SoC Regression ===\n{RULE}"
+SUMMARY_BANNER = f"\n{RULE}\n=== Regression Summary ===\n{RULE}"
+
+# The final verdict lines. `PASS_VERDICT` is printed only if every single test
+# in the suite returned a "PASS" status. Otherwise `FAIL_VERDICT` immediately
+# alerts the user that there is a problem that requires investigation and
+# prompts them to check the generated log files for the failure details.
+PASS_VERDICT = ">>> ALL TESTS PASSED! Regression successful. <<<"
+FAIL_VERDICT = ">>> REGRESSION FAILED! Check logs for details. <<<"
+
 # --- Configuration ---
 # List of Verilog/SystemVerilog files to be compiled.
 # The paths are relative to the project's root directory.
 # The order is critical to satisfy module dependencies.
 
-# `COMPILE_ORDER`: This is a Python list of strings that specifies every
+# `COMPILE_ORDER_RAW`: This is a Python list of strings that specifies every
 # single Verilog and SystemVerilog source file required to compile the design
 # and its testbench.
 #
@@ -125,11 +217,11 @@ TEST_CASES = [
 # dependencies, with the lowest-level RTL files first and the top-level
 # testbench file last.
 #
-# How it's used: The script will join all the strings in this list together
-# with spaces in between to form the file list portion of the final `iverilog`
-# compile command. Centralizing this list prevents compilation failures due
-# to incorrect file ordering and makes it easy to add new RTL files to the project.
-COMPILE_ORDER = [
+# How it's used: The script writes these paths, in order, to the compiler's
+# file list (see `BUILD_FILELIST` below). Centralizing this list prevents
+# compilation failures due to incorrect file ordering and makes it easy to add
+# new RTL files to the project.
+COMPILE_ORDER_RAW = [
     
     # RTL Files - From simplest peripherals to most complex
     "rtl/on_chip_ram.v",
@@ -152,43 +244,1059 @@ COMPILE_ORDER = [
     
 ]
 
+# `COMPILE_ORDER`: The same paths, normalised once when the script starts.
+# `pathlib.Path` converts each path to the operating system's own form (for
+# example, `rtl\timer.v` on Windows) and tidies redundant parts such as
+# `./` or doubled slashes. Every later use (the file list, the hashes, the
+# makefile) takes these ready-made strings, so no path is re-processed during
+# the run.
+COMPILE_ORDER = [str(pathlib.Path(p)) for p in COMPILE_ORDER_RAW]
+
+
+# `SIM_DATA_FILES`: Files that the simulation itself reads at run time, such
+# as memory images loaded with `$readmemh`. The design does not use any yet;
+# any that are added should be listed here so that they are pre-loaded into
+# memory before the tests start (see `prewarm_page_cache`).
+SIM_DATA_FILES = []
+
+
+# --- Compiler File List ---
+# Rather than passing every source file on the compiler's command line, the
+# paths in `COMPILE_ORDER` are written to a "command file", `build.f`, one path
+# per line, and the compiler is pointed at it (`iverilog -c build.f`,
+# `verilator -f build.f`). This keeps the command line short no matter how
+# many files the design grows to (Windows in particular limits its length),
+# and the same file serves every simulator backend. Because `build.f` is an
+# ordinary file, the build steps below can also treat it as a dependency:
+# reordering `COMPILE_ORDER` rewrites it, which triggers a recompile.
+BUILD_FILELIST = "build.f"
+
+
+# `write_build_filelist`: Generates `build.f` from `COMPILE_ORDER`. Like
+# `build.mk` below, the file is only rewritten when its contents actually
+# change, so that its timestamp only moves when the file list does.
+def write_build_filelist():
+    contents = "".join(path + "\n" for path in COMPILE_ORDER)
+    try:
+        with open(BUILD_FILELIST) as f:
+            if f.read() == contents:
+                return
+    except FileNotFoundError:
+        pass
+    with open(BUILD_FILELIST, "w") as f: f.write(contents)
+
 
 # --- Compile Command Generation ---
-# This section programmatically constructs the complete compilation command string.
+# This section programmatically constructs the complete compilation command.
 # By building the command from the configuration variables above, we ensure that
 # any changes to the file list are automatically reflected in the command,
 # making the script robust and maintainable.
-
-# This line uses the `join()` string method in Python.
-#   - `" ".join(...)`: This is a powerful and efficient way to concatenate all
-#     the elements of a list into a single string.
-#   - The `" "` part specifies the separator to be placed *between* each element.
-#   - `COMPILE_ORDER`: This is the list of file paths we are joining.
 #
-# The result is that the `COMPILE_FILES_STR` variable will hold a single string
-# like: "rtl/on_chip_ram.v rtl/crc32_accelerator.v ... tb/tb_risc_soc.sv"
-# This perfectly formatted string is now ready to be inserted into the full
-# command.
-COMPILE_FILES_STR = " ".join(COMPILE_ORDER)
-
-
-# This line uses a Python f-string (formatted string literal) to construct the
-# final, complete shell command for compilation. F-strings provide a concise
-# and readable way to embed expressions and variables directly into a string.
+# The command is an argument list ("argv") rather than a single string. Each
+# element is handed to the operating system as one argument, so `subprocess`
+# can start `iverilog` directly instead of first starting a shell (`/bin/sh`)
+# to split a string back into words. This saves a process launch, and a file
+# path containing a space can never be mis-split into two arguments.
 #
-# The f-string is broken down as follows:
+# The list is broken down as follows:
 #   - `iverilog`: The name of the command-line tool to execute.
 #   - `-g2005-sv`: The essential flag to enable SystemVerilog features in the
 #     compiler.
 #   - `-o soc_sim`: The flag to specify the name of the output executable file,
 #     `soc_sim`.
-#   - `{COMPILE_FILES_STR}`: This is the placeholder where the f-string will
-#     substitute the entire content of the `COMPILE_FILES_STR` variable we created
-#     in the previous line.
+#   - `-c build.f`: Read the list of source files from the command file
+#     generated by `write_build_filelist`.
+IV_COMPILE_ARGV = ["iverilog", "-g2005-sv", "-o", "soc_sim", "-c", BUILD_FILELIST]
+
+
+# The equivalent command for the Verilator simulator (see `SIMULATORS` below).
+# Verilator translates the design into C++ and compiles it into a native
+# executable, which typically simulates many times faster than the `vvp`
+# interpreter.
+#   - `--binary`: Build a complete, standalone simulation executable. This
+#     also enables `--timing`, which the testbench needs for its `#delay` and
+#     `wait` statements.
+#   - `-j 0`: Compile the generated C++ using every available CPU core.
+#   - `-O3`, `--x-assign fast`: Optimise for simulation speed.
+#   - `-Wno-fatal`: Report Verilator's (much stricter) lint warnings without
+#     treating them as build failures.
+#   - `--top-module tb_risc_soc`: The testbench is the top of the hierarchy.
+#   - `-o soc_sim`: The executable is written to `obj_dir/soc_sim`.
+#   - `-f build.f`: The same command file of sources as for Icarus.
+VL_COMPILE_ARGV = ["verilator", "--binary", "-j", "0", "-O3", "--x-assign", "fast", "-Wno-fatal",
+                   "--top-module", "tb_risc_soc", "-o", "soc_sim", "-f", BUILD_FILELIST]
+
+
+# --- Simulator Backends ---
+# `SIMULATORS` describes each supported simulator, selected with the `--sim`
+# option. Icarus Verilog is the default.
+#   - `compile_argv`: The command that compiles the design.
+#   - `image`: The compiled simulation file that the command produces.
+#   - `run_argv`: The command that runs a simulation (the test's plusargs
+#     are appended to it). Icarus needs the `vvp` runtime to execute its
+#     image; Verilator's image is a native executable and runs by itself.
+# Both simulators read `+TESTNAME` through `$value$plusargs`, so the testbench
+# behaves identically under either one.
+SIMULATORS = {
+    "icarus": {
+        "compile_argv": IV_COMPILE_ARGV,
+        "image": "soc_sim",
+        "run_argv": ["vvp", "soc_sim"],
+    },
+    "verilator": {
+        "compile_argv": VL_COMPILE_ARGV,
+        "image": os.path.join("obj_dir", "soc_sim"),
+        "run_argv": [os.path.join("obj_dir", "soc_sim")],
+    },
+}
+
+
+
+# --- Fast Process Launch ---
+# The traditional way to start a program on Linux is `fork()` + `exec()`:
+# the Python process is first duplicated (including its memory page tables)
+# and the copy then replaces itself with the new program. CPython can instead
+# use `posix_spawn()`, which the C library implements with a much cheaper
+# `vfork`-style launch. `subprocess` only takes that fast path when the
+# program is given as a full path, `close_fds=False`, and no options such as
+# `cwd`, `preexec_fn` or `pass_fds` are used.
+#
+# `close_fds=False` is safe: since Python 3.4, every file that Python opens is
+# marked as non-inheritable, so a child process still only receives the
+# stdin/stdout/stderr that `subprocess` sets up for it.
+#
+# In practice, only the compiler and `make` launches take this fast path.
+# The simulations are started in their own working directory (see
+# `WORK_DIR`) and in a session of their own (see `SIM_SPAWN_KWARGS`), and
+# CPython rules out `posix_spawn()` for either option. On Linux, CPython 3.10
+# and later still launches such a child with `vfork()` instead of a full
+# `fork()`, so they remain cheap to start. This is expected: removing `cwd`
+# or `start_new_session` to get `posix_spawn()` back would undo the per-test
+# directories or the clean shutdown of the simulators.
+SPAWN_KWARGS = {"close_fds": False}
+
+# `SIM_SPAWN_KWARGS`: The options for launching a simulation. On top of
+# `SPAWN_KWARGS`, `start_new_session=True` puts every simulation in a
+# process group of its own, so that stopping it (see `kill_simulation`) also
+# stops any program the simulator itself started. (It has no effect on
+# Windows.) As explained above, it also means a simulation is never started
+# with `posix_spawn()`.
+SIM_SPAWN_KWARGS = {**SPAWN_KWARGS, "start_new_session": True}
+
+
+# `_tool_path`: Returns the full path of a program, found by searching `PATH`
+# like the shell would. If the program cannot be found, the name is returned
+# as-is and `subprocess` reports the error when it tries to launch it.
+@functools.lru_cache(maxsize=None)
+def _tool_path(name):
+    return shutil.which(name) or name
+
+
+# `spawn_argv`: Returns a copy of `argv` with the program name replaced by its
+# full path, so that the `posix_spawn()` fast path described above can be taken.
+def spawn_argv(argv):
+    return [_tool_path(argv[0]), *argv[1:]]
+
+
+# `tool_identity`: Returns a string that identifies the installed copy of a
+# program: its full path, size and modification time. Installing a different
+# version of the program (or pointing `PATH` at another one) changes the
+# string, so the caches below, which include it in their keys, never reuse a
+# result produced by a different tool. If the program cannot be found, only
+# its name is returned.
+@functools.lru_cache(maxsize=None)
+def tool_identity(name):
+    path = _tool_path(name)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return path
+    return f"{path}:{st.st_size}:{st.st_mtime_ns}"
+
+
+# --- Compilation Cache ---
+# Compiling the design is the largest fixed cost of every regression run, yet
+# most runs (re-running a flaky test, checking a testbench tweak that was
+# reverted, etc.) compile exactly the same sources as the run before. The
+# compiled `soc_sim` is therefore stored under `.compile_cache/<key>/`, where
+# the key is a hash of everything that can influence the compiler's output.
+# If the key matches a previous run, the stored result is reused and the
+# compiler is not invoked at all. The `--no-cache` option bypasses the cache
+# and always runs the compiler.
+COMPILE_CACHE_DIR = ".compile_cache"
+
+# `COMPILE_CACHE_KEEP`: How many compiled images the cache holds. Every
+# source change adds a new entry, so after each compile the entries that have
+# gone unused the longest are deleted, keeping only this many.
+COMPILE_CACHE_KEEP = 8
+
+# `COMPILE_LOG`: The file that receives everything the compiler prints.
+COMPILE_LOG = "log_compile.txt"
+
+# `COMPILE_LOG_TAIL`: How much of the end of the compile log is printed when
+# the compilation fails. Compiler errors are at the end, and the first error
+# is usually the one that matters; the full log stays on disk.
+COMPILE_LOG_TAIL = 4096
+
+
+# `print_log_tail`: Prints the last `COMPILE_LOG_TAIL` bytes of a log file.
+# Only that much is read: the file is opened in binary mode and `seek` jumps
+# straight to the tail, however long the log is.
+def print_log_tail(path):
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - COMPILE_LOG_TAIL))
+        print(f.read().decode(errors="replace"))
+
+
+# `compute_compile_key`: Returns the cache key for the current source tree
+# when compiled with simulator `sim` (an entry of `SIMULATORS`).
+#
+# How it works: A hash is fed the path and the full contents of every file in
+# `COMPILE_ORDER`, followed by every argument of the compile command and the
+# identity of the compiler itself (see `tool_identity`). The null byte
+# separators ensure that, for example, moving text from the end of one file to
+# the start of the next still produces a different key. Changing any source
+# file, the file order, a compiler flag or the compiler changes the key.
+#
+# The hash is BLAKE2b, which is faster than SHA-256 on 64-bit machines and
+# equally safe from accidental collisions. A 16-byte digest (32 hex digits)
+# is plenty for telling builds apart and keeps the cache directory names short.
+def compute_compile_key(sim):
+    h = hashlib.blake2b(digest_size=16)
+    for path in COMPILE_ORDER:
+        with open(path, "rb") as f:
+            h.update(path.encode() + b"\0" + f.read() + b"\0")
+    h.update(b"\0".join(arg.encode() for arg in sim["compile_argv"]))
+    h.update(b"\0" + tool_identity(sim["compile_argv"][0]).encode())
+    return h.hexdigest()
+
+
+# `prune_cache`: Deletes all but the `keep` most recently used entries (the
+# subdirectories) of the cache in `cache_dir`. An entry's modification time
+# is its last use: it is set when the entry is created, and again on every
+# cache hit. The same function also limits the simulation result cache.
+def prune_cache(cache_dir, keep):
+    try:
+        entries = [entry for entry in os.scandir(cache_dir) if entry.is_dir()]
+    except FileNotFoundError:
+        return
+    entries.sort(key=lambda entry: entry.stat().st_mtime_ns, reverse=True)
+    for entry in entries[keep:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+
+# --- Compile Manifest (Fast Path) ---
+# Hashing every source file still means reading all of them. For the most
+# common case of all—nothing changed since the last run—even that is more work
+# than necessary. After every successful compile the script records the size
+# and modification time of each source file (and of the `soc_sim` it left
+# behind) in `.compile_cache/manifest_<simulator>.json`. On the next run a
+# quick `os.stat` of each file, which does not read any file contents, is
+# enough to prove that nothing has changed and that the existing `soc_sim` is
+# still current.
+def manifest_path(sim_name):
+    return os.path.join(COMPILE_CACHE_DIR, f"manifest_{sim_name}.json")
+
+
+# `stat_sources`: Returns `{path: [size, mtime_ns]}` for every file in
+# `COMPILE_ORDER`, plus `build.f` (whose stats change when the file order
+# does). Lists are used (rather than tuples) so that the result compares equal
+# to the same data after a round trip through JSON.
+def stat_sources():
+    stats = {}
+    for path in [*COMPILE_ORDER, BUILD_FILELIST]:
+        st = os.stat(path)
+        stats[path] = [st.st_size, st.st_mtime_ns]
+    return stats
+
+
+# `build_manifest`: Describes the current build: the compile command and the
+# compiler's identity, the source file stats, and the stats of the compiled
+# image in the working directory. `None` is recorded for the image if it does
+# not exist.
+def build_manifest(sim, source_stats):
+    try:
+        st = os.stat(sim["image"])
+        sim_stat = [st.st_size, st.st_mtime_ns]
+    except FileNotFoundError:
+        sim_stat = None
+    return {"argv": sim["compile_argv"], "tool": tool_identity(sim["compile_argv"][0]),
+            "sources": source_stats, "soc_sim": sim_stat}
+
+
+# `manifest_is_current`: Returns `True` if the manifest from the last compile
+# describes exactly the current build, meaning `soc_sim` is already up to date.
+def manifest_is_current(sim_name, source_stats):
+    try:
+        with open(manifest_path(sim_name)) as f:
+            previous = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return False
+    current = build_manifest(SIMULATORS[sim_name], source_stats)
+    return current["soc_sim"] is not None and previous == current
+
+
+# `write_manifest`: Records the current build as the new manifest.
+def write_manifest(sim_name, source_stats):
+    os.makedirs(COMPILE_CACHE_DIR, exist_ok=True)
+    with open(manifest_path(sim_name), "w") as f:
+        json.dump(build_manifest(SIMULATORS[sim_name], source_stats), f, indent=2)
+
+
+# `compile_design`: Produces an up-to-date simulation image for simulator
+# `sim_name` (a key of `SIMULATORS`) in the working directory.
+#
+# It returns `True` if the design is ready to simulate and `False` if the
+# compilation failed. Three checks are tried in order of increasing cost:
+#   1. The manifest: if no source file has been touched since the last
+#      compile, the `soc_sim` already in place is used as-is.
+#   2. The content-hash cache: if these exact sources were compiled before
+#      (e.g. after switching back to an older branch), the stored image is
+#      reused.
+#   3. A real compiler run, whose result is added to the cache.
+# With `use_cache=False` (`--no-cache`), the first two are skipped, and the
+# result is not stored.
+#
+# Failures are never cached. A compile can fail because of the machine
+# rather than the sources (an old or broken compiler, a full disk), and a
+# cached failure would keep being replayed after the machine was fixed.
+def compile_design(sim_name, use_cache=True):
+
+    sim = SIMULATORS[sim_name]
+    print(f"\n--- Compiling the design using explicit order ({sim_name}) ---")
+
+    # This line prints the exact command that will be executed, which is
+    # invaluable for debugging the script itself.
+    print(f"Compile Command: {' '.join(sim['compile_argv'])}")
+    write_build_filelist()
+
+    # The sources are stat'ed before they are hashed or compiled. If a file is
+    # edited while the script runs, the manifest records the older stats and
+    # the next run simply re-checks the file, so the manifest can never claim
+    # that a newer edit was compiled when it was not.
+    #
+    # A source file that does not exist (deleted, or renamed without updating
+    # `COMPILE_ORDER`) can never compile, so it is reported as a compilation
+    # failure straight away, before either cache is consulted.
+    try:
+        source_stats = stat_sources()
+    except FileNotFoundError as e:
+        print("[ERROR] Compilation failed!")
+        print(f"Source file not found: {e.filename}")
+        return False
+    if use_cache and manifest_is_current(sim_name, source_stats):
+        print(f"Sources unchanged since the last compile; reusing {sim['image']}.")
+        return True
+
+    cache_dir = os.path.join(COMPILE_CACHE_DIR, compute_compile_key(sim))
+    cached_sim = os.path.join(cache_dir, "soc_sim")
+
+    # Cache hit: a previous run already compiled exactly these sources. The
+    # entry's modification time is updated to mark it as recently used (see
+    # `prune_cache`).
+    if use_cache and os.path.exists(cached_sim):
+        os.makedirs(os.path.dirname(sim["image"]) or ".", exist_ok=True)
+        shutil.copy(cached_sim, sim["image"])
+        os.utime(cache_dir)
+        write_manifest(sim_name, source_stats)
+        print("Compilation cache hit.")
+        return True
+
+
+    # `subprocess.run()` is the function that executes the external command.
+    # The compiler's output (its warnings as well as its errors) is sent
+    # straight into `log_compile.txt` (`stdout=log`, with `stderr` merged into
+    # the same file) instead of being captured into Python strings. A
+    # successful compile can print hundreds of kilobytes of warnings that
+    # nobody reads; this way the script never has to hold them in memory, and
+    # they are still on disk for anyone who wants to look.
+    #
+    # If the compiler cannot be started at all (for example, because it is
+    # not installed or not on the `PATH`), `subprocess` raises an `OSError`.
+    # That is reported as a compilation failure too, with the operating
+    # system's reason in place of the compiler's messages.
+    try:
+        with open(COMPILE_LOG, "wb") as log:
+            result = subprocess.run(spawn_argv(sim["compile_argv"]), stdout=log, stderr=subprocess.STDOUT,
+                                    **SPAWN_KWARGS)
+    except OSError as e:
+        print("[ERROR] Compilation failed!")
+        print(f"Could not run {sim['compile_argv'][0]}: {e}")
+        return False
+
+    # A non-zero exit code indicates an error, e.g., a compile error.
+    if result.returncode != 0:
+
+        # Print a clear error message to the user, followed by the end of the
+        # compile log, which holds the specific Verilog error messages from
+        # the compiler. Printing this is essential for debugging the RTL or
+        # testbench code.
+        print("[ERROR] Compilation failed!")
+        print_log_tail(COMPILE_LOG)
+        return False
+
+    # Otherwise the compilation was successful (returned an exit code of 0).
+    # The image is copied into the cache under a temporary name and then
+    # renamed, so that a second regression running at the same time never sees
+    # a half-written file.
+    print("Compilation successful.")
+    if not use_cache:
+        return True
+    os.makedirs(cache_dir, exist_ok=True)
+    shutil.copy(sim["image"], cached_sim + ".tmp")
+    os.replace(cached_sim + ".tmp", cached_sim)
+    write_manifest(sim_name, source_stats)
+    prune_cache(COMPILE_CACHE_DIR, COMPILE_CACHE_KEEP)
+    return True
+
+
+
+# --- Make-Based Compilation (Optional) ---
+# As an alternative to the built-in caches above, the decision "does the design
+# need to be recompiled?" can be delegated to `make`, which answers it by
+# comparing the timestamp of `soc_sim` against every file it depends on. When
+# the script is run with `--make`, it generates a small makefile, `build.mk`,
+# listing every file in `COMPILE_ORDER` (and the `build.f` file list generated
+# from it) as a dependency of `soc_sim`. The same file can also be used
+# directly (`make -f build.mk`) by anyone who prefers driving the compile step
+# by hand.
+#
+# The makefile lists `build.mk` itself as a dependency too, so a change to the
+# compiler flags (which rewrites `build.mk`) also triggers a rebuild, just as a
+# change to the file order does through `build.f`. None of the project's
+# sources use `` `include ``, so the files in `COMPILE_ORDER` are the complete
+# set of dependencies.
+BUILD_MAKEFILE = "build.mk"
+
+
+# `write_build_makefile`: Generates `build.mk` from the current configuration.
+# The file is only rewritten when its contents actually change, because
+# rewriting it would update its timestamp and force a needless rebuild.
+def write_build_makefile():
+    sources = " \\\n          ".join(COMPILE_ORDER)
+    contents = (
+        "# Generated by scripts/run_regression.py -- do not edit.\n"
+        f"SOURCES = {sources}\n"
+        "\n"
+        f"soc_sim: $(SOURCES) {BUILD_FILELIST} {BUILD_MAKEFILE}\n"
+        f"\t{' '.join(IV_COMPILE_ARGV)}\n"
+    )
+    try:
+        with open(BUILD_MAKEFILE) as f:
+            if f.read() == contents:
+                return
+    except FileNotFoundError:
+        pass
+    with open(BUILD_MAKEFILE, "w") as f: f.write(contents)
+
+
+# `compile_with_make`: The `--make` equivalent of `compile_design`.
+#
+# `make -q` ("question mode") runs nothing; it only reports through its exit
+# code whether the target is up to date (0) or needs rebuilding (non-zero).
+# The real `make` is only invoked in the second case.
+def compile_with_make():
+
+    print(f"\n--- Compiling the design using {BUILD_MAKEFILE} ---")
+    write_build_filelist()
+    write_build_makefile()
+
+    # As in `compile_design`, a `make` that cannot be started is reported as a
+    # compilation failure. (A missing compiler is reported by `make` itself,
+    # through its exit code.)
+    make_argv = ["make", "-f", BUILD_MAKEFILE, "soc_sim"]
+    try:
+        question = subprocess.run(spawn_argv(["make", "-q", "-f", BUILD_MAKEFILE, "soc_sim"]), **SPAWN_KWARGS)
+        if question.returncode == 0:
+            print("soc_sim is up to date; skipping compilation.")
+            return True
+
+        with open(COMPILE_LOG, "wb") as log:
+            result = subprocess.run(spawn_argv(make_argv), stdout=log, stderr=subprocess.STDOUT, **SPAWN_KWARGS)
+    except OSError as e:
+        print("[ERROR] Compilation failed!")
+        print(f"Could not run make: {e}")
+        return False
+    if result.returncode != 0:
+        print("[ERROR] Compilation failed!")
+        print_log_tail(COMPILE_LOG)
+        return False
+
+    print("Compilation successful.")
+    return True
+
+
+
+# `prewarm_page_cache`: Reads the given files once so that the operating
+# system holds them in its page cache (memory).
+#
+# Why is this useful? When the regression starts, every parallel simulation
+# opens and reads the same compiled image at the same moment. If the image is
+# not in memory yet, all of those reads queue up on the disk together. Reading
+# it once beforehand means every simulation finds it already in memory.
+# `os.posix_fadvise(..., POSIX_FADV_WILLNEED)` additionally asks the kernel to
+# start the read-ahead immediately; it is not available on every platform
+# (e.g. Windows or macOS), in which case the plain read does the same job.
+def prewarm_page_cache(paths):
+    for path in paths:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            while os.read(fd, 1 << 20):
+                pass
+        finally:
+            os.close(fd)
+
+
+
+# --- Per-Test Status Messages ---
+# The console message printed for each possible test outcome. Keeping them in
+# one dictionary means the worker function only has to return a short status
+# code, and the main thread decides how to present it.
+STATUS_MESSAGES = {
+    "PASS": "PASSED",
+    "FAIL": "FAILED",
+    "UNKNOWN": "UNKNOWN - Could not determine pass/fail.",
+    "CRASH": "ERROR - Simulation crashed.",
+    "CANCELLED": "CANCELLED - Stopped after an earlier failure.",
+}
+
+
+# --- Pass/Fail Signatures ---
+# `SCANNERS` lists the patterns that the testbench prints to report the outcome
+# of a test, paired with the status each one implies. They are part of the
+# "contract" between the testbench and this script.
+#   - `"Test Successful"` is the final message printed by the testbench upon
+#     successful completion of any test, and `"All Transactions PASSED"` is a
+#     backup check.
+#   - `"TEST FAILED"` or `"ERROR"` are the keywords printed by the testbench's
+#     `$error` system task calls. Verilator prefixes the same messages with
+#     `"%Error"` instead, so that is a fail signature too.
+#
+# The list is in priority order: when the output contains several patterns,
+# the one listed first decides the status. A fail signature anywhere in the
+# log therefore means a FAIL. This matters because `$error` does not stop the
+# simulation: a scoreboard that reports a mismatch lets the test run to
+# completion, and the testbench then prints its "Test Successful" banner all
+# the same. The same rule decides the result of each unit test inside
+# `FULL_REGRESSION` (see `track_components`). New checks, such as a latency
+# warning or an assertion counter, are added by inserting an entry at the
+# position that gives them the right priority.
+#
+# The patterns are `bytes` patterns (`rb"..."`) because the simulator output is
+# handled as raw bytes and is never decoded into Python text.
+#
+# Rule: log files are write-once. All parsing runs against the simulator
+# output as it streams in; never re-open `log_<test>.txt` during the run to
+# scan it again. Any new check belongs in this list instead.
+SCANNERS = [
+    (re.compile(rb"TEST FAILED|ERROR|%Error"), "FAIL"),
+    (re.compile(rb"All Transactions PASSED|Test Successful"), "PASS"),
+]
+
+# All the scanners are combined into one regular expression, compiled once
+# when the script starts, so that a single scan of the text finds every
+# pattern at once. Each scanner becomes a named group (`s0`, `s1`, ...), and
+# the name of the group that matched tells which scanner it was.
+_SCANNER_RE = re.compile(b"|".join(
+    b"(?P<s%d>%s)" % (i, pattern.pattern) for i, (pattern, _) in enumerate(SCANNERS)))
+
+# `_SCANNER_PREFILTER` matches exactly the same text, but without the named
+# groups. Without them, the regular expression engine can skip quickly over
+# text that cannot start a match, which makes it several times faster at
+# rejecting the vast majority of lines that contain no signature at all. Only
+# a line that passes this cheap check is scanned with `_SCANNER_RE` to find
+# out which scanner matched.
+_SCANNER_PREFILTER = re.compile(b"|".join(pattern.pattern for pattern, _ in SCANNERS))
+
+# The priority (position in `SCANNERS`) of each status. "UNKNOWN" (nothing
+# matched) ranks below every scanner.
+_STATUS_RANK = {status: i for i, (_, status) in reversed(list(enumerate(SCANNERS)))}
+
+
+# `classify`: Returns the status implied by a piece of simulator output.
 #
-# The resulting `IV_COMPILE_CMD` variable now holds the complete, ready-to-execute
-# command that will be passed to the shell.
-IV_COMPILE_CMD = f"iverilog -g2005-sv -o soc_sim {COMPILE_FILES_STR}"
+# `sim_output_bytes` may be a whole log or just one line of it. To classify a
+# log that arrives line by line, pass the status found so far as `status`:
+# the result is whichever of the two has the higher priority, so feeding each
+# line through `classify` in turn gives the same answer as classifying the
+# complete log at once.
+def classify(sim_output_bytes, status="UNKNOWN"):
+    if not _SCANNER_PREFILTER.search(sim_output_bytes):
+        return status
+    best = _STATUS_RANK.get(status, len(SCANNERS))
+    for m in _SCANNER_RE.finditer(sim_output_bytes):
+        best = min(best, int(m.lastgroup[1:]))
+    return SCANNERS[best][1] if best < len(SCANNERS) else "UNKNOWN"
+
+
+# --- Component Test Markers ---
+# Inside `FULL_REGRESSION`, the testbench prints "=== Starting <TEST> ==="
+# before and "=== Finished <TEST> ===" after each of the unit tests it runs.
+# Following these markers gives every unit test its own result from the one
+# combined log: the lines between a test's two markers are classified just
+# like a whole log, and a test that reaches its "Finished" marker without
+# printing a fail signature has passed. (The "Finished" marker takes the place
+# of the "Test Successful" banner, which is printed only once, at the very
+# end.)
+_COMPONENT_RE = re.compile(rb"=== (?P<kind>Starting|Finished) (?P<test>\S+) ===")
+
+
+# `track_components`: Follows the component test markers through one line of
+# simulator output.
+#
+# `components` maps each unit test whose "Starting" marker has been seen to
+# its status so far, and `current` is the test in progress (or `None`). The
+# function updates `components` and returns the new `current`. Marker lines
+# all begin with "=== ", so every other line is ruled out by a cheap
+# `startswith` check before the regular expression is tried.
+def track_components(line, components, current):
+    marker = _COMPONENT_RE.match(line) if line.startswith(b"=== ") else None
+    if marker is None:
+        if current is not None:
+            components[current] = classify(line, components[current])
+        return current
+    if marker["kind"] == b"Starting":
+        current = marker["test"].decode()
+        components[current] = "UNKNOWN"
+        return current
+    if current is not None and components[current] == "UNKNOWN":
+        components[current] = "PASS"
+    return None
+
+
+# `finish_components`: Settles the status of the unit test that was still in
+# progress when the simulation ended, using the same rules as for a whole
+# test: unless it already failed, it was either cancelled or crashed.
+def finish_components(components, current):
+    if current is not None and components[current] != "FAIL":
+        components[current] = "CANCELLED" if _stop_requested.is_set() else "CRASH"
+
+
+# `fold_components`: Returns the status of a simulation, given the `status`
+# of its whole log and the results of the unit tests it ran. A simulation
+# cannot pass if one of its unit tests did not: it then takes the status of
+# the first such test.
+def fold_components(status, components):
+    if status != "PASS":
+        return status
+    return next((r for r in components.values() if r != "PASS"), "PASS")
+
+
+# --- Stopping Early (`--exit-on-first-fail`) ---
+# When the regression is asked to stop at the first failing test, the tests
+# that are still running must be killed. `_live_processes` holds the `Popen`
+# handle of every simulation that is currently running, and `_stop_requested`
+# is set once the regression has decided to stop. `_live_lock` keeps the two
+# consistent, so that a simulation being launched at the very moment the
+# regression stops is still killed. It is re-entrant (`RLock`) because the
+# termination handler (see `handle_termination`) may run while the main thread
+# is already holding it.
+_live_processes = set()
+_live_lock = threading.RLock()
+_stop_requested = threading.Event()
+
+
+# `kill_simulation`: Stops simulation `p` by sending `SIGTERM` to its whole
+# process group (see `SIM_SPAWN_KWARGS`). Where process groups do not exist
+# (Windows), only the simulator itself is terminated.
+def kill_simulation(p):
+    if not hasattr(os, "killpg"):
+        p.terminate()
+        return
+    try:
+        os.killpg(p.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        pass
+
+
+# `stop_running_tests`: Kills every simulation that is still running, and any
+# simulation that a worker thread launches afterwards.
+def stop_running_tests():
+    with _live_lock:
+        _stop_requested.set()
+        for p in _live_processes:
+            kill_simulation(p)
+
+
+# `handle_termination`: The handler for `SIGTERM` and `SIGHUP`, the signals a
+# CI system sends when a job times out and a terminal sends when it is
+# closed. The simulations run in sessions of their own (see
+# `SIM_SPAWN_KWARGS`), so these signals never reach them; the handler stops
+# them before the script exits, rather than leaving them running.
+def handle_termination(signum, frame):
+    stop_running_tests()
+    raise SystemExit(128 + signum)
+
+
+# --- Simulation Result Cache ---
+# A simulation is deterministic: the testbench uses a fixed random seed, so
+# running the same test against the same design always prints the same log.
+# The result of every test that PASSes or FAILs is therefore stored under
+# `.sim_cache/<key>/`, as a copy of its log and a status file, and a
+# later run whose key matches reuses the result without launching a
+# simulation at all. The status file is a small JSON document that also holds
+# the component results of a `FULL_REGRESSION` run (see `track_components`).
+# (A CRASH or UNKNOWN result may have been caused by the machine rather than
+# the design, so it is never cached.) The `--no-cache` option, meant for
+# nightly runs, ignores the cache and simulates everything. A cached test's
+# waveform is not restored; re-run it with `--no-cache` when the waveform is
+# needed.
+SIM_CACHE_DIR = ".sim_cache"
+
+# `SIM_CACHE_KEEP`: How many results the cache holds. Each entry holds the
+# result of one simulation, so this covers the last few versions of the
+# design for every test; after each run, the entries that have gone unused
+# the longest are deleted (see `prune_cache`).
+SIM_CACHE_KEEP = 48
+
+# `CACHEABLE_STATUSES`: The results that are stored in the cache.
+CACHEABLE_STATUSES = ("PASS", "FAIL")
+
+# `job_name`: The name under which a simulation is reported and logged:
+# the test name, or for a shard of `FULL_REGRESSION`, for example,
+# "FULL_REGRESSION_shard2".
+def job_name(test, shard):
+    return test if shard is None else f"{test}_shard{shard[0]}"
+
+
+# `compute_test_key`: Returns the result cache key of one simulation.
+#
+# Like `compute_compile_key`, it is a BLAKE2b hash, here of everything that
+# can change the simulation's outcome: the design as compiled (given by
+# `compile_key`, the `compute_compile_key` of the run, which covers every
+# source file, the compiler and its flags), the run command and the identity
+# of the program it runs (unless that is the compiled image itself), the test
+# and shard, and the pass/fail signatures and their order (see `SCANNERS`).
+#
+# Every test depends on the whole design: besides the peripheral it is
+# written for, each one uses the shared memory and waits on the CPU's
+# interrupt line, which any other peripheral can drive. Editing any source
+# file therefore invalidates every cached result.
+def compute_test_key(compile_key, sim, test, shard):
+    h = hashlib.blake2b(digest_size=16)
+    tools = [tool_identity(sim["run_argv"][0])] if sim["run_argv"][0] != sim["image"] else []
+    for part in [compile_key, *sim["run_argv"], *tools, test, repr(shard)]:
+        h.update(part.encode() + b"\0")
+    for pattern, status in SCANNERS:
+        h.update(pattern.pattern + b"\0" + status.encode() + b"\0")
+    return h.hexdigest()
+
+
+# `load_cached_result`: If the cache holds a result for simulation `name`
+# under `key`, restores its log to `log_<name>.txt` and returns its
+# `(status, components)`. Returns `None` otherwise.
+def load_cached_result(key, name):
+    cache_dir = os.path.join(SIM_CACHE_DIR, key)
+    try:
+        with open(os.path.join(cache_dir, f"{name}.json")) as f:
+            cached = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    shutil.copy(os.path.join(cache_dir, f"{name}.log"), f"log_{name}.txt")
+    os.utime(cache_dir)
+    return cached["status"], cached["components"]
+
+
+# `store_cached_result`: Adds the result of simulation `name` to the cache.
+# As with the compilation cache, each file is written under a temporary name
+# and then renamed, and the status file is written last, so that a result is
+# never found half-written.
+def store_cached_result(key, name, status, components):
+    cache_dir = os.path.join(SIM_CACHE_DIR, key)
+    os.makedirs(cache_dir, exist_ok=True)
+    cached_log = os.path.join(cache_dir, f"{name}.log")
+    shutil.copy(f"log_{name}.txt", cached_log + ".tmp")
+    os.replace(cached_log + ".tmp", cached_log)
+    cached_status = os.path.join(cache_dir, f"{name}.json")
+    with open(cached_status + ".tmp", "w") as f:
+        json.dump({"status": status, "components": components}, f)
+    os.replace(cached_status + ".tmp", cached_status)
+
+
+# --- Per-Test Working Directories ---
+# Every simulation runs in a scratch directory of its own, `work/<name>/`,
+# that holds everything the simulator writes there: the waveform, and any
+# other file the testbench might create with `$fopen` in the future. Tests
+# running side by side can therefore never overwrite each other's files,
+# whatever they are called. The log files are written by this script, not by
+# the simulator, and stay in the project directory as before.
+WORK_DIR = "work"
+
+
+# `make_workdir`: Creates (if needed) and returns the working directory of
+# simulation `name`.
+def make_workdir(name):
+    workdir = os.path.join(WORK_DIR, name)
+    os.makedirs(workdir, exist_ok=True)
+    return workdir
+
+
+# `absolute_run_argv`: Returns `sim["run_argv"]` with the compiled image given
+# as an absolute path, so that a simulation started in its working directory
+# still finds it.
+def absolute_run_argv(sim):
+    return [os.path.abspath(arg) if arg == sim["image"] else arg for arg in sim["run_argv"]]
+
+
+# `remove_stale_log`: Deletes `log_<name>.txt`, if it exists. It is used for
+# a test whose result in this run did not come from a simulation of its own
+# (for example, a unit test whose result was read from `FULL_REGRESSION`),
+# so that the log of an earlier run is never mistaken for this one's.
+def remove_stale_log(name):
+    try:
+        os.remove(f"log_{name}.txt")
+    except FileNotFoundError:
+        pass
+
+
+# `run_one_test`: Runs a single test case to completion and classifies it.
+#
+# What it does: It launches one simulation (with `vvp`, for the default
+# Icarus backend; `sim` is the selected entry of `SIMULATORS`), streams its
+# output to `log_<name>.txt`, and parses that output for the pass/fail
+# signatures. It returns a `(name, status, components)` tuple so that the
+# caller can match results back to tests even when many tests are running at
+# once. `components` holds the result of every unit test that a
+# `FULL_REGRESSION` run went through (see `track_components`), and is empty
+# for any other test.
+#
+# `shard` optionally selects one part of the `FULL_REGRESSION` suite, as an
+# `(index, count)` pair that is passed to the testbench as the `+SHARD_INDEX`
+# and `+SHARD_COUNT` plusargs. The `name` it is reported under is given by
+# `job_name`.
+#
+# Why is it a separate function? Each call is completely self-contained (it
+# shares no state with any other test), which is exactly what allows the
+# `main()` function to hand these calls to a pool of worker threads and run
+# the whole regression in parallel.
+def run_one_test(test, sim, shard=None):
+
+    name = job_name(test, shard)
+
+    # The command is built as an argument list rather than a single string.
+    # This lets `subprocess` launch `vvp` directly, without starting an
+    # intermediate `/bin/sh` just to split the string back into words.
+    #   - `absolute_run_argv(sim)`: For Icarus, this is `vvp <path>/soc_sim`.
+    #     `vvp` is the Icarus Verilog runtime engine that executes the compiled
+    #     simulation file, and `soc_sim` is the file created by the `iverilog`
+    #     command in the compilation step.
+    #   - `+TESTNAME={test}`: This is the critical "plusarg" that tells the
+    #     SystemVerilog testbench which test task to execute.
+    #   - `+DUMPFILE=waveform_{name}.vcd`: Names the waveform file after the
+    #     test, so that it can be told apart from the others once it is copied
+    #     out of `work/<name>/`.
+    workdir = make_workdir(name)
+    run_argv = [*absolute_run_argv(sim), f"+TESTNAME={test}", f"+DUMPFILE=waveform_{name}.vcd"]
+    if shard is not None:
+        run_argv += [f"+SHARD_INDEX={shard[0]}", f"+SHARD_COUNT={shard[1]}"]
+
+    # `status` is the verdict based on the output seen so far. It stays
+    # "UNKNOWN" if no pass or fail signature is ever printed, which could
+    # happen if the testbench hangs, or if there's a bug in its display
+    # messages. That must be flagged rather than assumed to be a pass.
+    status = "UNKNOWN"
+    components, current = {}, None
+
+    # --- Log File Archiving ---
+    # The complete output of the simulation is archived to a dedicated log
+    # file, e.g. "log_DMA_TEST.txt". When a test fails, the brief "FAIL"
+    # message on the console is not enough to debug the problem; the engineer
+    # needs the full context printed by the testbench (which transaction
+    # failed, what were the addresses, what was the mismatched data?). This log
+    # is the first and most essential piece of evidence in any debug session.
+    #
+    # The output is streamed: `subprocess.Popen` starts `vvp` with its output
+    # connected to a pipe, and every line is written to the log file as it is
+    # read. The script never holds the whole log in memory (simulation logs
+    # can grow to gigabytes).
+    #   - `stderr=subprocess.STDOUT`: Merges error messages into the same
+    #     stream, so they appear in the log in the order they were printed.
+    #
+    # The log is copied as raw bytes: the file is opened in binary mode
+    # (`"wb"`) and `Popen` is not asked to decode the output, so the text is
+    # never run through a UTF-8 decode/encode round trip on its way to disk.
+    # `buffering=1 << 20` gives the log file a 1 MiB write buffer, so a long
+    # log is written to disk in a few large chunks rather than in thousands of
+    # small writes.
+    #
+    # A simulator that cannot be started at all (for example, `vvp` is not
+    # installed) makes `Popen` raise an `OSError`. The reason is written to
+    # the log and the test is reported as a "CRASH", just like a simulation
+    # that died on its own, instead of the error ending the whole regression.
+    with open(f"log_{name}.txt", "wb", buffering=1 << 20) as f:
+        try:
+            p = subprocess.Popen(spawn_argv(run_argv), stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                 cwd=workdir, **SIM_SPAWN_KWARGS)
+        except OSError as e:
+            f.write(f"Could not run {run_argv[0]}: {e}\n".encode())
+            return name, "CRASH", {}
+        with p:
+
+            with _live_lock:
+                if _stop_requested.is_set():
+                    kill_simulation(p)
+                _live_processes.add(p)
+
+            for line in p.stdout:
+                f.write(line)
+
+                # --- Result Parsing Logic (Log File Grep) ---
+                # Each line is checked for the pass/fail signatures while it
+                # is being written, so the log never has to be read back from
+                # disk.
+                status = classify(line, status)
+                if test == FULL_REGRESSION:
+                    current = track_components(line, components, current)
+
+            # Wait for the simulator to exit so that its exit code is
+            # available.
+            p.wait()
+            with _live_lock:
+                _live_processes.discard(p)
+
+    # A non-zero exit code means the simulation terminated abnormally. Unless
+    # the log already shows a functional failure, which is the more useful
+    # thing to report, the test is recorded as a "CRASH".
+    # A simulation that was killed by `stop_running_tests` is reported as
+    # "CANCELLED" instead, since it did not fail on its own.
+    if p.returncode != 0 and status != "FAIL":
+        status = "CANCELLED" if _stop_requested.is_set() else "CRASH"
+    finish_components(components, current)
+
+    return name, fold_components(status, components), components
+
+
+# --- Server Mode (`--server`) ---
+# Starting a simulation has a fixed cost: the simulator loads and links the
+# whole compiled design, and the testbench generates its random data, before
+# the first test instruction runs. For short tests that start-up can cost as
+# much as the test itself. In server mode the script starts ONE simulation and
+# feeds it the test names, one per line, through a named pipe (a FIFO) passed
+# as the `+SERVER_FIFO` plusarg. The testbench runs the tests one after another
+# and brackets each one with a sentinel line:
+#
+#     === SERVER: BEGIN DMA_TEST ===
+#     ...
+#     === SERVER: END DMA_TEST ===
+#
+# The script splits the output on these sentinels into the usual
+# `log_<test>.txt` files; anything printed outside a test (the start-up
+# banner and data generation) goes to `log_server.txt`.
+#
+# The server runs in `work/server/`, and the FIFO is created there too.
+SERVER_FIFO = "ctrl.fifo"
+_SERVER_SENTINEL_RE = re.compile(rb"=== SERVER: (?P<kind>BEGIN|END) (?P<test>\S+) ===")
+
+
+# `run_tests_in_server`: Runs `tests` in a single server-mode simulation.
+#
+# It is a generator: it yields a `(test, status, components)` tuple (as
+# returned by `run_one_test`) the moment each test's END sentinel is read, so
+# the caller can report (and, with `-x`, act on) each result straight away.
+# If the simulation exits in the middle of a test, that test is reported as
+# "CRASH" (or "FAIL", if its log already shows a failure), and the tests it
+# never reached are reported as "CRASH" too. If it was stopped by
+# `stop_running_tests`, the test in progress is "CANCELLED" and the tests it
+# never reached are not reported at all.
+def run_tests_in_server(tests, sim):
+
+    workdir = make_workdir("server")
+    fifo_path = os.path.join(workdir, SERVER_FIFO)
+    if os.path.exists(fifo_path):
+        os.remove(fifo_path)
+    os.mkfifo(fifo_path)
+
+    # The test names are written from a separate thread, because opening a
+    # FIFO for writing blocks until the simulator opens it for reading.
+    # Closing the FIFO afterwards is what tells the testbench that there are
+    # no more tests.
+    def feed_test_names():
+        try:
+            with open(fifo_path, "wb") as fifo:
+                fifo.write(b"".join(test.encode() + b"\n" for test in tests))
+        except OSError:
+            pass
+
+    feeder = threading.Thread(target=feed_test_names, daemon=True)
+    feeder.start()
+
+    run_argv = [*absolute_run_argv(sim), f"+SERVER_FIFO={SERVER_FIFO}", "+DUMPFILE=waveform_server.vcd"]
+    not_started = list(tests)
+    current, status = None, "UNKNOWN"
+    components, component = {}, None
+    server_log = log = open("log_server.txt", "wb", buffering=1 << 20)
+    try:
+        # As in `run_one_test`, a simulator that cannot be started makes every
+        # test a "CRASH", with the reason written to `log_server.txt`.
+        try:
+            p = subprocess.Popen(spawn_argv(run_argv), stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                 cwd=workdir, **SIM_SPAWN_KWARGS)
+        except OSError as e:
+            server_log.write(f"Could not run {run_argv[0]}: {e}\n".encode())
+            for test in tests:
+                yield test, "CRASH", {}
+            return
+
+        with p:
+
+            with _live_lock:
+                if _stop_requested.is_set():
+                    kill_simulation(p)
+                _live_processes.add(p)
+
+            for line in p.stdout:
+                sentinel = _SERVER_SENTINEL_RE.match(line)
+                if sentinel and sentinel["kind"] == b"BEGIN":
+                    current, status = sentinel["test"].decode(), "UNKNOWN"
+                    components, component = {}, None
+                    if current in not_started:
+                        not_started.remove(current)
+                    log = open(f"log_{current}.txt", "wb", buffering=1 << 20)
+
+                log.write(line)
+                if current is not None:
+                    status = classify(line, status)
+                    if current == FULL_REGRESSION:
+                        component = track_components(line, components, component)
+
+                if sentinel and sentinel["kind"] == b"END" and current is not None:
+                    log.close()
+                    log = server_log
+                    yield current, fold_components(status, components), components
+                    current = None
+
+            p.wait()
+            with _live_lock:
+                _live_processes.discard(p)
+
+        if current is not None:
+            if status != "FAIL":
+                status = "CANCELLED" if _stop_requested.is_set() else "CRASH"
+            finish_components(components, component)
+            yield current, fold_components(status, components), components
+        if not _stop_requested.is_set():
+            for test in not_started:
+                yield test, "CRASH", {}
+
+    finally:
+        if log is not server_log:
+            log.close()
+        server_log.close()
+
+        # If the simulator exited without ever opening the FIFO, the feeder
+        # thread is still blocked opening it. Briefly opening the read end
+        # releases it (its write then fails harmlessly).
+        if feeder.is_alive():
+            fd = os.open(fifo_path, os.O_RDONLY | os.O_NONBLOCK)
+            feeder.join(timeout=1)
+            os.close(fd)
+        os.remove(fifo_path)
 
 
 
@@ -196,75 +1304,102 @@ IV_COMPILE_CMD = f"iverilog -g2005-sv -o soc_sim {COMPILE_FILES_STR}"
 # standard Python convention that improves code organization and allows the
 # script to be potentially importable by other Python modules without
 # immediately executing its code.
+#
+# It returns the script's exit status: 0 if every test passed, and 1 if the
+# compilation or any test failed, so that a CI job can tell the two apart
+# without reading the report.
 def main():
-    
+
+    # --- Command-Line Options ---
+    # `argparse` turns the script's command-line arguments into the `args`
+    # object. Every option is off by default, so running the script with no
+    # arguments behaves exactly as it always has.
+    parser = argparse.ArgumentParser(description="Compile the RISC-V SoC and run its regression suite.")
+    parser.add_argument("--make", action="store_true",
+                        help=f"let make decide whether to recompile, using a generated {BUILD_MAKEFILE}")
+    parser.add_argument("-x", "--exit-on-first-fail", action="store_true",
+                        help="stop the regression as soon as one test does not pass")
+    parser.add_argument("--force-full", action="store_true",
+                        help=f"simulate {FULL_REGRESSION} instead of deriving it from the unit test results")
+    parser.add_argument("--sim", choices=sorted(SIMULATORS), default="icarus",
+                        help="simulator to compile and run the design with (default: icarus)")
+    parser.add_argument("--server", action="store_true",
+                        help="run every test in one long-lived simulation, fed test names through a FIFO")
+    parser.add_argument("--no-cache", action="store_true",
+                        help=f"compile and simulate everything, ignoring the caches in {COMPILE_CACHE_DIR}/ "
+                             f"and {SIM_CACHE_DIR}/")
+    parser.add_argument("--tests", metavar="TEST[,TEST...]",
+                        help=f"run only these tests, separated by commas (default: all); naming "
+                             f"{FULL_REGRESSION} implies --force-full")
+    parser.add_argument("-j", "--jobs", type=int, metavar="N",
+                        help="run at most N simulations at once (default: the number of CPU cores minus 2)")
+    parser.add_argument("--shards", type=int, default=1, metavar="N",
+                        help=f"with --force-full, split {FULL_REGRESSION} into N simulations that run in "
+                             "parallel (default: 1)")
+    args = parser.parse_args()
+    if args.make and args.sim != "icarus":
+        parser.error("--make is only supported with --sim=icarus")
+    if args.server and not hasattr(os, "mkfifo"):
+        parser.error("--server needs named pipes (os.mkfifo), which this platform does not provide")
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.shards < 1:
+        parser.error("--shards must be at least 1")
+    if args.shards > 1 and args.server:
+        parser.error("--shards cannot be combined with --server, which runs every test in one simulation")
+
+    try:
+        os.remove(REGRESSION_REPORT)
+    except FileNotFoundError:
+        pass
+
+    # `selected`: The tests the user asked for. A developer iterating on one
+    # test (`--tests UART_LOOPBACK_TEST`) then only pays for that one
+    # simulation. Asking for `FULL_REGRESSION` means it must really be
+    # simulated, just as with `--force-full`.
+    selected = TEST_CASES if args.tests is None else args.tests.split(",")
+    unknown = [test for test in selected if test not in TEST_CASES]
+    if unknown:
+        parser.error(f"unknown test(s) {', '.join(unknown)}; choose from {', '.join(TEST_CASES)}")
+    force_full = args.force_full or (args.tests is not None and FULL_REGRESSION in selected)
+    if args.shards > 1 and not force_full:
+        parser.error(f"--shards only applies to a simulated {FULL_REGRESSION} (--force-full)")
+    unit_tests = [test for test in UNIT_TESTS if test in selected]
+
     # Print a banner to the console to indicate the start of the process. This
     # kind of user feedback is crucial for long-running scripts.
-    print("=======================================")
-    print("=== Starting RISC-V SoC Regression ===")
-    print("=======================================")
+    print(START_BANNER)
+
+    # The fast process launch described under `SPAWN_KWARGS` depends on the
+    # Python build and the C library. If this Python cannot use
+    # `posix_spawn()` at all, every compile and tool launch falls back to a
+    # slower `fork()`; say so, so that a CI machine can be given a better one.
+    if os.name == "posix" and not getattr(subprocess, "_USE_POSIX_SPAWN", False):
+        print("[WARN] This Python cannot launch programs with posix_spawn(); process launches will be slower.")
+
+    # `SIGHUP` does not exist on Windows.
+    for signame in ("SIGTERM", "SIGHUP"):
+        if hasattr(signal, signame):
+            signal.signal(getattr(signal, signame), handle_termination)
     
     
     # --- Step 1: Compilation ---
     # This phase attempts to compile the entire design and testbench. If this
     # step fails, there is no point in attempting to run any simulations, so the
     # script should exit.
-    print(f"\n--- Compiling the design using explicit order ---")
-    
-    # This line prints the exact command that will be executed, which is
-    # invaluable for debugging the script itself.
-    print(f"Compile Command: {IV_COMPILE_CMD}")
-    
-    
-    # This `try...except` block is a robust error-handling mechanism. The script
-    # will "try" to execute the code within the `try` block. If that code
-    # raises a specific type of error (an "exception"), the script will not
-    # crash; instead, it will jump to the `except` block to handle the error
-    # gracefully.
-    try:
-        
-        
-        # `subprocess.run()` is the function that executes the external command.
-        # It takes several important arguments:
-        #   - `IV_COMPILE_CMD`: The string variable holding the full compile command.
-        #   - `shell=True`: This tells the function to execute the command through
-        #     the system's default shell (like Bash on Linux). This is necessary
-        #     for the shell to interpret the command string correctly.
-        #   - `check=True`: This is a critical argument. If the command returns
-        #     a non-zero exit code (which indicates an error, e.g., a compile
-        #     error), this will automatically raise a `CalledProcessError`
-        #     exception, triggering the `except` block.
-        #   - `capture_output=True`, `text=True`: These arguments capture the
-        #     standard output and standard error streams from the command and
-        #     decode them as text.
-
-        subprocess.run(IV_COMPILE_CMD, shell=True, check=True, capture_output=True, text=True)
-        
-        # If `subprocess.run` completes without raising an exception, it means
-        # the compilation was successful (returned an exit code of 0).
-        print("Compilation successful.")
-        
-    # This `except` clause will only execute if the `subprocess.run` command
-    # failed (because `check=True` was set).
-    except subprocess.CalledProcessError as e:
-        
-        # The `e` object contains information about the error.
-        # Print a clear error message to the user.
-        print("[ERROR] Compilation failed!")
-        
-        # `e.stderr` contains the standard error output from the failed command,
-        # which will include the specific Verilog error messages from `iverilog`.
-        # Printing this is essential for debugging the RTL or testbench code.
-        print(e.stderr)
-        
-        # The script terminates here, as there is no point continuing if the
-        # design did not compile.
-        return
-    
-    
+    compile_ok = compile_with_make() if args.make else compile_design(args.sim, use_cache=not args.no_cache)
+    if not compile_ok:
+        write_report({"COMPILE": "FAIL"})
+        return 1
+
+
     # --- Step 2: Simulation Loop ---
-    # This section executes after a successful compilation. It iterates through
-    # each test case, runs the simulation, and records the result.
+    # This section executes after a successful compilation. Every test is an
+    # independent `vvp` process with no shared state, so instead of running them
+    # one after another (wall time = sum of all test durations) they are handed
+    # to a pool of worker threads and run concurrently (wall time ~ the longest
+    # test). A thread pool is sufficient here: the real work happens inside the
+    # child `vvp` processes, so the Python threads only sit waiting on pipes.
 
     # `results`: This initializes an empty Python dictionary.
     #
@@ -276,195 +1411,219 @@ def main():
     # "FAIL"). This provides a structured way to collect all the results before
     # printing the final summary.
     results = {}
-    
-    # This `for` loop is the main engine of the regression. It iterates through
-    # every element in the `TEST_CASES` list that was defined at the top of the
-    # script. For each iteration, the current test name from the list is assigned
-    # to the variable `test`.
-    for test in TEST_CASES:
-        
-        # This print statement provides real-time feedback to the user, showing
-        # which specific test is about to be executed. This is crucial for
-        # monitoring the progress of a long regression run.
-        print(f"\n--- Running Test: {test} ---")
-        
-        
-        # This f-string constructs the specific command needed to run one test.
-        #   - `vvp`: This is the Icarus Verilog runtime engine that executes the
-        #     compiled simulation file.
-        #   - `soc_sim`: This is the name of the executable file created by the
-        #     `iverilog` command in the compilation step.
-        #   - `+TESTNAME={test}`: This is the critical "plusarg". The `{test}`
-        #     placeholder is replaced with the current test name from the loop
-        #     (e.g., "DMA_TEST"). This entire string is passed to the simulator,
-        #     allowing the SystemVerilog testbench to read it and select the
-        #     correct test task to execute.
-        run_cmd = f"vvp soc_sim +TESTNAME={test}"
-        
-        # This `try...except` block handles the execution of a single simulation.
-        # This is essential because one test might crash or fail, but we want
-        # the regression script to continue running the other tests.
+
+    # `notes`: For a result that has no log of its own, a note for the summary
+    # that tells where to look instead (for example, the `FULL_REGRESSION` log
+    # that a unit test's result was read from).
+    notes = {}
+
+    # Unless `-j` says otherwise, two cores are left free for the OS and the
+    # Python process itself, as is common practice for batch simulation farms.
+    # `max(1, ...)` keeps the pool usable on single- and dual-core machines.
+    max_workers = args.jobs or max(1, (os.cpu_count() or 1) - 2)
+
+    # `jobs`: The simulations to run, as `(test, shard)` arguments for
+    # `run_one_test`. By default these are the (selected) unit tests. With
+    # `--force-full` only `FULL_REGRESSION` is simulated, since it runs every
+    # unit test anyway and their results are read from its log. By default it
+    # is one simulation, so that every test runs after every earlier one just
+    # as in a single long run. Being by far the longest simulation, it keeps
+    # one core busy while the others sit idle, so `--shards N` splits it into
+    # shards that run in parallel, each running a share of the suite's tests.
+    # There is no point in having more shards than the suite has tests, one
+    # for each unit test.
+    jobs = [(test, None) for test in unit_tests]
+    full_shards = []
+    if force_full:
+        shard_count = min(args.shards, len(UNIT_TESTS))
+        if shard_count > 1:
+            full_shards = [job_name(FULL_REGRESSION, (i, shard_count)) for i in range(shard_count)]
+            jobs = [(FULL_REGRESSION, (i, shard_count)) for i in range(shard_count)]
+        else:
+            jobs = [(FULL_REGRESSION, None)]
+
+    sim = SIMULATORS[args.sim]
+
+    # `cache_keys`: The result cache key of every simulation, by name. It
+    # stays empty with `--no-cache`, which disables the result cache entirely.
+    #
+    # It also stays empty with `--server`. There, a test runs straight after
+    # the ones before it, in the same simulation and without a reset, so its
+    # result depends on which tests ran first; and skipping the cached tests
+    # would change that order for the others. Server-mode results are
+    # therefore neither reused nor stored.
+    cache_keys = {}
+    if not args.no_cache and not args.server:
+        compile_key = compute_compile_key(sim)
+        cache_keys = {job_name(test, shard): compute_test_key(compile_key, sim, test, shard)
+                      for test, shard in jobs}
+
+    # `record`: Prints and stores the result of one finished test, together
+    # with the results of the unit tests it ran (its `components`), and adds
+    # it to the result cache if it was simulated (rather than `cached`) and
+    # is complete. A simulation that finishes after the regression was told
+    # to stop may have been killed partway through, and a unit test that was
+    # cut short has no result worth keeping, so neither is stored. With
+    # `--exit-on-first-fail` (`-x`), the first test that does not pass stops
+    # the regression: it returns True once the remaining simulations have been
+    # told to stop.
+    def record(test, status, components, cached=False):
+        note = " (cached)" if cached else ""
+        for component, component_status in components.items():
+            print(f"[STATUS] {component:<20} : {STATUS_MESSAGES[component_status]} (from {test}){note}")
+            results[component] = component_status
+            notes[component] = f"see log_{test}.txt"
+            remove_stale_log(component)
+        print(f"[STATUS] {test:<20} : {STATUS_MESSAGES[status]}{note}")
+        results[test] = status
+        complete = not _stop_requested.is_set() and all(r in CACHEABLE_STATUSES for r in components.values())
+        if test in cache_keys and status in CACHEABLE_STATUSES and complete and not cached:
+            store_cached_result(cache_keys[test], test, status, components)
+        failed = status != "PASS" or any(r != "PASS" for r in components.values())
+        if args.exit_on_first_fail and failed and not _stop_requested.is_set():
+            print(f"[INFO] Stopping the regression after the failure of {test}.")
+            stop_running_tests()
+            return True
+        return False
+
+    # Every simulation whose result is in the cache is reported straight away
+    # and dropped from `jobs`. If a cached failure stops the regression (`-x`),
+    # nothing is simulated at all.
+    for test, shard in list(jobs):
+        name = job_name(test, shard)
+        cached = load_cached_result(cache_keys[name], name) if name in cache_keys else None
+        if cached is not None:
+            jobs.remove((test, shard))
+            record(name, *cached, cached=True)
+    if _stop_requested.is_set():
+        jobs = []
+
+    # There is no point in starting more worker threads than there are
+    # simulations left to run (for example, when most results came from the
+    # cache).
+    max_workers = max(1, min(max_workers, len(jobs)))
+
+    if args.server:
+        print(f"\n--- Running {len(jobs)} tests in one server-mode simulation ---")
+    else:
+        print(f"\n--- Running {len(jobs)} simulations on {max_workers} parallel worker(s) ---")
+    prewarm_page_cache([sim["image"], *SIM_DATA_FILES])
+
+    # Every test is submitted to the pool up front, and `wait(...,
+    # return_when=FIRST_COMPLETED)` hands back each test the moment it
+    # finishes, so its status is printed straight away.
+    #
+    # With `--exit-on-first-fail` (`-x`), the first test that does not pass
+    # stops the regression: tests that have not started yet are cancelled,
+    # and the simulations that are still running are killed. This gives the
+    # developer the bad news without waiting for the rest of the suite. The
+    # default behaviour, which nightly runs rely on, is unchanged: every test
+    # runs to completion.
+    #
+    # Because each simulation runs in its own session, pressing Ctrl+C only
+    # interrupts this script, not the simulators. The `KeyboardInterrupt` is
+    # therefore caught just long enough to stop them, rather than leaving them
+    # running in the background. The `SystemExit` raised by
+    # `handle_termination` is caught the same way, so that no test that was
+    # still waiting in the pool is started afterwards.
+    if args.server:
         try:
-            
-            
-            # `subprocess.check_output()` is used here instead of `run()`. It is
-            # similar, but it directly returns the standard output of the command
-            # as a Python variable. It will also raise a `CalledProcessError` if
-            # the command returns a non-zero exit code (i.e., if the simulation
-            # terminates with a `$error` or `$finish(2)` in the Verilog code).
-            #   - `shell=True`: Again, needed to interpret the command string correctly.
-            #   - `text=True`: Ensures the returned output is a normal Python string.
-            
-            sim_output = subprocess.check_output(run_cmd, shell=True, text=True)
-            
-            
-            # --- Log File Archiving ---
-            # This line performs a critical function for any serious regression
-            # system: it archives the complete output of the simulation to a
-            # dedicated log file.
-            #
-            # How it works:
-            #   - `with open(...) as f:`: This is the standard, robust way to
-            #     handle files in Python. It automatically manages opening and
-            #     closing the file, even if errors occur.
-            #   - `f"log_{test}.txt"`: This f-string dynamically creates a unique
-            #     filename for each test. For example, when running the "DMA_TEST",
-            #     it will create a file named "log_DMA_TEST.txt".
-            #   - `"w"`: This opens the file in "write" mode, which will create a
-            #     new file or overwrite an existing one.
-            #   - `f.write(sim_output)`: This writes the entire captured output
-            #     from the simulation (all the `$display` messages) into the file.
-            #
-            # Why is this so important?
-            # When a test fails, the brief "FAIL" message on the console is not
-            # enough to debug the problem. The engineer needs to see the full
-            # context: which specific transaction failed, what were the addresses,
-            # what was the mismatched data? This log file contains all of that
-            # detailed information printed by the testbench. It is the first
-            # and most essential piece of evidence used to begin the debugging
-            # process. Without these archived logs, debugging a regression
-            # failure would be nearly impossible.
-            with open(f"log_{test}.txt", "w") as f: f.write(sim_output)
-            
-            # --- Result Parsing Logic (Log File Grep) ---
-            # This block of code acts as an intelligent "grep" or search function.
-            # Its purpose is to parse the `sim_output` string (which contains the
-            # entire simulation log) to find specific keywords that indicate the
-            # outcome of the test. This is the core of automated pass/fail detection.
-
-            # The `if` condition checks for the presence of known "pass" signatures.
-            #   - `in` is a Python operator that returns `True` if a substring is
-            #     found within a larger string.
-            #   - `"Test Successful"` is the final message printed by the testbench
-            #     upon successful completion of any test.
-            #   - `"All Transactions PASSED"` is a backup check, demonstrating how
-            #     multiple pass conditions can be handled.
-            # If either of these strings is found, the test is considered a success.
-            if "All Transactions PASSED" in sim_output or "Test Successful" in sim_output:
-                
-                # Print a clear status message to the console for the user.
-                print(f"[STATUS] PASSED")
-                
-                # Update the results dictionary, storing "PASS" as the value
-                # for the current test's key.
-                results[test] = "PASS"
-                
-            # The `elif` (else if) condition checks for known "fail" signatures.
-            # This is only checked if the "pass" condition was false.
-            #   - `"TEST FAILED"` or `"ERROR"` are the keywords printed by the
-            #     testbench's `$error` system task calls.
-            # The presence of either of these keywords definitively indicates a failure.
-            elif "TEST FAILED" in sim_output or "ERROR" in sim_output:
-                print(f"[STATUS] FAILED")
-                
-                # Store "FAIL" in the results dictionary.
-                results[test] = "FAIL"
-                
-            # The `else` block is a catch-all. It executes if neither a clear
-            # pass nor a clear fail signature was found in the log file.
-            else:
-                
-                # This could happen if the testbench hangs, or if there's a bug
-                # in the testbench's display messages.
-                print(f"[STATUS] UNKNOWN - Could not determine pass/fail.")
-                
-                # It's important to flag this as "UNKNOWN" rather than assuming
-                # a pass, as it indicates a problem with the verification
-                # environment itself that needs investigation.
-                results[test] = "UNKNOWN"
-                
-        # This `except` block catches a simulation that has crashed (returned
-        # a non-zero exit code).
-        except subprocess.CalledProcessError as e:
-            
-            # Print a clear message indicating which test failed to complete.
-            print(f"[ERROR] Simulation crashed for test: {test}")
-            
-            # Record the result as a "CRASH" in our results dictionary.
-            results[test] = "CRASH"
-    
-    
+            for result in run_tests_in_server([test for test, _ in jobs], sim) if jobs else []:
+                record(*result)
+        except (KeyboardInterrupt, SystemExit):
+            stop_running_tests()
+            raise
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as ex:
+            pending = {ex.submit(run_one_test, test, sim, shard) for test, shard in jobs}
+            try:
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        if fut.cancelled():
+                            continue
+                        if record(*fut.result()):
+                            for other in pending:
+                                other.cancel()
+            except (KeyboardInterrupt, SystemExit):
+                for other in pending:
+                    other.cancel()
+                stop_running_tests()
+                raise
+
+    if cache_keys:
+        prune_cache(SIM_CACHE_DIR, SIM_CACHE_KEEP)
+
+    # A sharded `FULL_REGRESSION` passes only if every one of its shards
+    # passed; otherwise it takes the status of the first shard that did not.
+    if full_shards:
+        shard_results = [results.pop(shard, "CANCELLED") for shard in full_shards]
+        results[FULL_REGRESSION] = next((r for r in shard_results if r != "PASS"), "PASS")
+        print(f"[STATUS] {FULL_REGRESSION:<20} : {STATUS_MESSAGES[results[FULL_REGRESSION]]}"
+              f" (combined from {len(full_shards)} shards)")
+        notes[FULL_REGRESSION] = f"see log_{FULL_REGRESSION}_shard*.txt"
+        remove_stale_log(FULL_REGRESSION)
+
+    # Unless it was simulated, the result of `FULL_REGRESSION` follows directly
+    # from the results of the unit tests it is made of, provided that all of
+    # them were run.
+    if not force_full and unit_tests == UNIT_TESTS:
+        full_passed = all(results.get(test) == "PASS" for test in UNIT_TESTS)
+        results[FULL_REGRESSION] = "PASS" if full_passed else "FAIL"
+        print(f"[STATUS] {FULL_REGRESSION:<20} : {STATUS_MESSAGES[results[FULL_REGRESSION]]}"
+              " (derived from the unit tests)")
+        notes[FULL_REGRESSION] = "derived from the unit tests"
+        remove_stale_log(FULL_REGRESSION)
+
+    # Shard logs that this run did not write (left over from an earlier run
+    # with a different number of shards, or none) are removed as well.
+    if FULL_REGRESSION in results:
+        for i in range(len(UNIT_TESTS)):
+            if job_name(FULL_REGRESSION, (i, None)) not in full_shards:
+                remove_stale_log(job_name(FULL_REGRESSION, (i, None)))
+
+    # Restore the order of `TEST_CASES` (results were collected in the order
+    # the tests finished), leaving out the tests that were neither selected
+    # nor run. A selected test that never ran was either cancelled by `-x`
+    # or, with `--force-full`, never reached because its `FULL_REGRESSION`
+    # simulation crashed first.
+    never_ran = "CANCELLED" if _stop_requested.is_set() else "CRASH"
+    results = {test: results.get(test, never_ran) for test in TEST_CASES
+               if test in selected or test in results}
+
+
     # This final block of code executes after all tests in the suite have been
     # run. Its sole purpose is to process the `results` dictionary and present a
     # clean, formatted, and conclusive summary to the user. This is the ultimate
     # output of the regression script.
 
-    # Print a clear header for the summary section in the console output.
-    print("\n=======================================")
-    print("=== Regression Summary ===")
-    print("=======================================")
-    
-     # `all_passed`: This initializes a boolean "flag" variable to True.
-    # What is its purpose? It will be used to keep track of the overall success
-    # of the entire regression. We start with the optimistic assumption that
-    # everything has passed. This flag will be "pulled down" to False if we
-    # encounter even a single non-passing test.
-    all_passed = True
-    
-    # This `for` loop iterates through all the key-value pairs stored in the
-    # `results` dictionary.
-    #   - `.items()`: This is a dictionary method that returns an iterable view
-    #     of the dictionary's pairs.
-    #   - `for test, result in ...`: On each iteration, the key is assigned to
-    #     the `test` variable, and its corresponding value is assigned to the
-    #     `result` variable.
-    for test, result in results.items():
-        
-        # This uses an f-string to print a single, formatted line for each test.
-        #   - `{test:<20}`: This is a formatting specifier. The `<` character
-        #     left-aligns the string, and the `20` reserves a total of 20
-        #     character spaces for the test name. This ensures that the results
-        #     are printed in a neat, aligned column, regardless of the length
-        #     of the test names.
-        #   - `: {result}`: Prints the pass/fail status for that test.
-        print(f"  {test:<20} : {result}")
-        
-        # This `if` statement checks the status of the current test.
-        # If the result for this test is anything other than "PASS" (e.g.,
-        # "FAIL", "CRASH", "UNKNOWN"), the overall regression is considered a failure.
-        if result != "PASS":
-            
-            # The `all_passed` flag is set to False. Once this flag is set to
-            # False, it will remain False for the rest of the loop, correctly
-            # capturing that at least one test has failed.
-            all_passed = False
-    print("---------------------------------------")
-    
-    # This final `if/else` statement checks the overall status flag `all_passed`
-    # to print the final, conclusive verdict of the entire regression run.
-    if all_passed:
-        
-        # This message is printed only if every single test in the suite returned
-        # a "PASS" status.
-        print(">>> ALL TESTS PASSED! Regression successful. <<<")
-    else:
-        
-        # If the `all_passed` flag was pulled down to False at any point, this
-        # message is printed, immediately alerting the user that there is a
-        # problem that requires investigation. The user is prompted to check the
-        # generated log files for the specific failure details.
-        print(">>> REGRESSION FAILED! Check logs for details. <<<")
-    print("=======================================")
+    # `all_passed`: The overall verdict of the regression. `all()` is True
+    # only if every single test returned "PASS"; a single "FAIL", "CRASH" or
+    # "UNKNOWN" result makes the whole regression a failure.
+    all_passed = all(result == "PASS" for result in results.values())
+
+    # The summary is built as one string (a header, one line per test and the
+    # final verdict) and written to the console with a single call instead of
+    # one `print` per line. This keeps the report in one piece and costs one
+    # write no matter how large the suite grows.
+    #
+    # Each test line uses an f-string formatting specifier:
+    #   - `{test:<20}`: The `<` character left-aligns the string, and the `20`
+    #     reserves a total of 20 character spaces for the test name. This
+    #     ensures that the results are printed in a neat, aligned column,
+    #     regardless of the length of the test names.
+    #   - `: {result}`: Prints the pass/fail status for that test.
+    #   - The note from `notes`, if the test has one, follows in brackets.
+    lines = [SUMMARY_BANNER]
+    lines += [f"  {test:<20} : {result}" + (f"  ({notes[test]})" if test in notes else "")
+              for test, result in results.items()]
+    lines += [THIN_RULE, PASS_VERDICT if all_passed else FAIL_VERDICT, RULE]
+    sys.stdout.write("\n".join(lines) + "\n")
+
+    # The same results are also saved in machine-readable form, so that a CI
+    # system can consume them without having to parse the console report.
+    write_report(results)
+    return 0 if all_passed else 1
 
 
 
@@ -474,9 +1633,10 @@ def main():
 # if the script is being executed directly from the command line (and not
 # imported by another script), `__name__` is set to the string `"__main__"`.
 # Therefore, this `if` statement ensures that the `main()` function is called
-# only when this script is the top-level program being run.
+# only when this script is the top-level program being run. `sys.exit` passes
+# the exit status returned by `main()` on to the shell.
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
 
 
 
@@ -525,10 +1685,11 @@ if __name__ == "__main__":
 --      configuration management. This makes the entire regression suite easy to
 --      modify and extend without changing the core logic.
 --
---   4. Robust Error Handling: The use of `try...except` blocks to catch both
---      compilation failures and simulation crashes makes the script robust. It
---      can distinguish between a test that fails functionally and one that fails
---      to even run, providing more precise feedback for debugging.
+--   4. Robust Error Handling: Every tool's exit code is checked, and a tool
+--      that cannot be started at all (an `OSError` from `subprocess`) is caught
+--      and reported rather than ending the script. This lets it distinguish
+--      between a compile error, a test that fails functionally, and one that
+--      fails to even run, providing more precise feedback for debugging.
 --
 --
 -- [[ My Implementation Flow ]]
@@ -678,8 +1839,10 @@ if __name__ == "__main__":
 --
 -- Upon execution, this command will:
 --   1. Invoke `iverilog` to compile the entire SoC design and testbench.
---   2. If compilation succeeds, it will sequentially invoke `vvp` for each test
---      case defined in the `TEST_CASES` list.
+--   2. If compilation succeeds, it will invoke `vvp` for each test case defined
+--      in the `UNIT_TESTS` list, running several simulations in parallel. The
+--      `FULL_REGRESSION` verdict is derived from their results (or, with
+--      `--force-full`, the other way around).
 --   3. For each test, it will create a corresponding log file (e.g., `log_DMA_TEST.txt`).
 --   4. It will parse the output from each test to determine its pass/fail status.
 --   5. Finally, it will print a formatted summary report to the console, giving
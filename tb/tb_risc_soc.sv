@@ -912,6 +912,112 @@ module tb_risc_soc;
 
 
 
+    // --- Test Selection ---
+    // These variables describe which test this simulation runs. They are
+    // declared at module level (rather than inside the main sequencer below)
+    // so that the `run_selected_test` dispatcher task can read them.
+
+    // A `string` is a SystemVerilog data type for holding variable-length text.
+    // It's used here to store the name of the test to be run.
+    string testname;
+
+    // `shard_index` and `shard_count` split the FULL_REGRESSION suite into
+    // `shard_count` parts, of which this simulation runs part number
+    // `shard_index` (counting from 0). The regression script runs all the
+    // parts in parallel, one simulation each. By default there is a single
+    // part containing every test.
+    integer shard_index;
+    integer shard_count;
+
+    // In server mode (`+SERVER_FIFO=<path>`), `server_fifo` holds the path of
+    // the named pipe that the regression script writes test names into, and
+    // `server_fd` is the file handle it is read through. An empty path means
+    // the normal one-test-per-simulation mode.
+    string server_fifo;
+    integer server_fd;
+
+
+    // This task is the main test dispatcher. It checks the value of the
+    // `testname` variable, calls the corresponding test task and, if the test
+    // completes without any `$error` calls, prints the success banner. It is
+    // shared by the normal mode (one test per simulation) and the server mode
+    // (many tests per simulation) of the main sequencer.
+    task run_selected_test;
+        begin
+
+            // This large `if/else if` chain selects the test task to call.
+            if (testname == "DMA_TEST") run_dma_test();
+            else if (testname == "CRC_TEST") run_crc_test();
+            else if (testname == "TIMER_TEST") run_timer_test();
+            else if (testname == "UART_LOOPBACK_TEST") run_uart_loopback_test();
+            else if (testname == "CORNER_CASE_TEST") run_negative_and_corner_case_tests();
+            else if (testname == "FULL_REGRESSION") begin
+                $display("\n\n>>> RUNNING FULL REGRESSION SUITE (shard %0d of %0d) <<<", shard_index, shard_count);
+
+                // The tests are numbered 0 to 4, and test number `k` belongs to the
+                // shard `k % shard_count`. With the default single shard, every
+                // test is run.
+                //
+                // Each test is bracketed by "=== Starting <TEST> ===" and
+                // "=== Finished <TEST> ===" markers. The regression script uses
+                // them to report a pass/fail result for every individual test
+                // from this one log, so that the tests do not also have to be
+                // simulated on their own.
+                if (0 % shard_count == shard_index) begin
+                    $display("=== Starting DMA_TEST ===");
+                    run_dma_test();
+                    $display("=== Finished DMA_TEST ===");
+                end
+                if (1 % shard_count == shard_index) begin
+                    $display("=== Starting CRC_TEST ===");
+                    run_crc_test();
+                    $display("=== Finished CRC_TEST ===");
+                end
+                if (2 % shard_count == shard_index) begin
+                    $display("=== Starting TIMER_TEST ===");
+                    run_timer_test();
+                    $display("=== Finished TIMER_TEST ===");
+                end
+                if (3 % shard_count == shard_index) begin
+                    $display("=== Starting UART_LOOPBACK_TEST ===");
+                    run_uart_loopback_test();
+                    $display("=== Finished UART_LOOPBACK_TEST ===");
+                end
+                if (4 % shard_count == shard_index) begin
+                    $display("=== Starting CORNER_CASE_TEST ===");
+                    run_negative_and_corner_case_tests();
+                    $display("=== Finished CORNER_CASE_TEST ===");
+                end
+
+                // The "FULL_REGRESSION" case simply calls all the individual test
+                // tasks sequentially, providing a comprehensive check of the whole design.
+                $display("\n\n>>> FULL REGRESSION SUITE COMPLETED SUCCESSFULLY <<<");
+            end
+
+            else begin
+
+                // If an unknown testname was provided on the command line, flag an error.
+                $error("Unknown TESTNAME specified: %s", testname);
+                $finish;
+
+            end
+
+            // If the selected test (or the full regression) completes without any
+            // `$error` calls, this final message is printed. This specific string,
+            // "--- Test Successful. ---", is what the `run_regression.py` script
+            // searches for in the log file to declare a PASS.
+
+            $display("\n======================================================");
+            $display("--- Test Successful. ---");
+            $display("======================================================");
+
+        end
+    endtask
+
+
+
+
+
     // --- Main Test Sequencer ---
     // This `initial` block is the heart of the testbench's execution flow. It
     // acts as the 'main()' function in a software program. It is responsible for
@@ -919,10 +1025,6 @@ module tb_risc_soc;
     // stimulus, and selecting which test case (or cases) to run.
     initial begin
 
-        // A `string` is a SystemVerilog data type for holding variable-length text.
-        // It's used here to store the name of the test to be run.
-        string testname;
-
         // An `integer` is a 32-bit signed variable used here to hold the seed for
         // the random number generator, ensuring repeatable random sequences.
         integer seed;
@@ -974,10 +1076,23 @@ module tb_risc_soc;
         // If no `TESTNAME` is provided, the testbench defaults to "FULL_REGRESSION".
         if (!$value$plusargs("TESTNAME=%s", testname)) testname = "FULL_REGRESSION";
 
+        // The optional `+SHARD_INDEX=<i>` and `+SHARD_COUNT=<n>` plusargs select
+        // one part of the FULL_REGRESSION suite (see the declarations above).
+        if (!$value$plusargs("SHARD_INDEX=%d", shard_index)) shard_index = 0;
+        if (!$value$plusargs("SHARD_COUNT=%d", shard_count)) shard_count = 1;
+
+        // The optional `+SERVER_FIFO=<path>` plusarg switches the testbench into
+        // server mode, in which `+TESTNAME` is ignored and the test names are
+        // read from the named pipe instead (see the server loop below).
+        if (!$value$plusargs("SERVER_FIFO=%s", server_fifo)) server_fifo = "";
+
         // Print a banner to the simulation log. This is good practice as it clearly
         // marks the beginning of a test run and which test is being executed.
         $display("======================================================");
         $display("--- Starting RISC-V SoC System-Level Test ---");
+        if (server_fifo != "")
+        $display("---           SERVER MODE: %s            ---", server_fifo);
+        else
         $display("---           TESTNAME: %s            ---", testname);
         $display("======================================================");
 
@@ -998,8 +1113,10 @@ module tb_risc_soc;
         // This block pre-generates the randomized data for the DMA and CRC tests.
         // This is done only if one of those tests (or the full regression) is selected.
         // Pre-generation ensures that the randomness is created once, and the same
-        // data can be used for multiple tests if needed, aiding in debug.
-        if (testname == "DMA_TEST" || testname == "CRC_TEST" || testname == "FULL_REGRESSION") begin
+        // data can be used for multiple tests if needed, aiding in debug. In
+        // server mode any test may be requested later, so the data is always
+        // generated.
+        if (testname == "DMA_TEST" || testname == "CRC_TEST" || testname == "FULL_REGRESSION" || server_fifo != "") begin
 
             // Seeding the random number generator with a fixed value is a critical
             // professional practice. It ensures that the "random" sequence
@@ -1057,42 +1174,38 @@ module tb_risc_soc;
         cpu_bfm_write(32'h0003_0000, 1);
         @(posedge clk);
 
-        // This large `if/else if` chain is the main test dispatcher. It checks the
-        // value of the `testname` variable and calls the corresponding test task.
-        if (testname == "DMA_TEST") run_dma_test();
-        else if (testname == "CRC_TEST") run_crc_test();
-        else if (testname == "TIMER_TEST") run_timer_test();
-        else if (testname == "UART_LOOPBACK_TEST") run_uart_loopback_test();
-        else if (testname == "CORNER_CASE_TEST") run_negative_and_corner_case_tests();
-        else if (testname == "FULL_REGRESSION") begin
-            $display("\n\n>>> RUNNING FULL REGRESSION SUITE <<<");
-            run_dma_test();
-            run_crc_test();
-            run_timer_test();
-            run_uart_loopback_test();
-            run_negative_and_corner_case_tests();
-
-            // The "FULL_REGRESSION" case simply calls all the individual test
-            // tasks sequentially, providing a comprehensive check of the whole design.
-            $display("\n\n>>> FULL REGRESSION SUITE COMPLETED SUCCESSFULLY <<<");
-        end 
-        
-        else begin
+        // --- Server Mode ---
+        // Instead of paying the simulator start-up cost once per test, the
+        // regression script can start a single simulation and feed it test
+        // names, one per line, through a named pipe. For each name the loop
+        // prints a BEGIN sentinel, clears any pending interrupt left over from
+        // the previous test, runs the test and prints an END sentinel; the
+        // script uses the sentinels to split the output into per-test logs.
+        // The simulation finishes when the script closes its end of the pipe.
+        if (server_fifo != "") begin
+
+            // Opening a named pipe for reading blocks until the script opens
+            // it for writing.
+            server_fd = $fopen(server_fifo, "r");
+            if (server_fd == 0) begin
+                $error("Cannot open SERVER_FIFO: %s", server_fifo);
+                $finish;
+            end
+
+            while ($fscanf(server_fd, "%s", testname) == 1) begin
+                $display("=== SERVER: BEGIN %s ===", testname);
+                cpu_bfm_write(32'h0003_0000, 1);
+                @(posedge clk);
+                run_selected_test();
+                $display("=== SERVER: END %s ===", testname);
+            end
 
-            // If an unknown testname was provided on the command line, flag an error.
-            $error("Unknown TESTNAME specified: %s", testname);
+            $fclose(server_fd);
             $finish;
 
         end
 
-        // If the selected test (or the full regression) completes without any
-        // `$error` calls, this final message is printed. This specific string,
-        // "--- Test Successful. ---", is what the `run_regression.py` script
-        // searches for in the log file to declare a PASS.
-
-        $display("\n======================================================");
-        $display("--- Test Successful. ---");
-        $display("======================================================");
+        run_selected_test();
 
         $finish;
 
@@ -1110,10 +1223,20 @@ module tb_risc_soc;
     
     initial begin
 
+        // `dumpfile_name`: The name of the waveform file for this run. It can be
+        // overridden on the command line with `+DUMPFILE=<name>`. The regression
+        // script runs every simulation in its own `work/<name>/` directory and
+        // uses this to name the file after the test ("waveform_<name>.vcd"), so
+        // that a waveform can still be told apart from the others once it is
+        // copied out of that directory.
+        string dumpfile_name;
+        if (!$value$plusargs("DUMPFILE=%s", dumpfile_name)) dumpfile_name = "waveform.vcd";
+
         // `$dumpfile` is a standard SystemVerilog system task that instructs the
         // simulator to create a specific file for storing waveform data.
         //
-        // What is it doing? It is creating a file named "waveform.vcd".
+        // What is it doing? It is creating a file named "waveform.vcd" (or the
+        // name given by the `+DUMPFILE` plusarg).
         //
         // What is a .vcd file? VCD stands for Value Change Dump. It is a standard,
         // ASCII-based file format that logs every single change in value for every
@@ -1126,7 +1249,7 @@ module tb_risc_soc;
         // always to open this VCD file to visually inspect the signals and trace the
         // root cause of the problem. It is the hardware equivalent of a software
         // debugger's variable watch window, but it captures a complete time-history.
-        $dumpfile("waveform.vcd");
+        $dumpfile(dumpfile_name);
 
 
 